@@ -9,10 +9,12 @@ logger = logging.getLogger(__name__)
 
 
 if __name__ == "__main__":
-    save_file = SaveFile(sys.argv[1])
-    save_file.decompress()
+    with SaveFile(sys.argv[1]) as save_file:
+        save_file.decompress()
 
-    with open("data/uncompressed_save.bin", "wb") as f:
-        f.write(save_file.data)
-    save_file.parse()
+        with open("data/uncompressed_save.bin", "wb") as f:
+            f.write(save_file.data)
+        workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        save_file.parse(workers=workers)
+        save_file.export("data/data.json")
     logger.info(unknown_types)
@@ -0,0 +1,170 @@
+import struct
+from dataclasses import dataclass, field
+from typing import Any
+
+from src.utils import Reader, Size, to_hex
+
+# struct code and conversion for the element types a property can hold, a
+# Float is returned as a 1-tuple to match parse_token
+ELEMENTS = {
+    "Float": ("f", lambda value: (value,)),
+}
+
+
+@dataclass
+class Field:
+    # skip:   count bytes read and dropped
+    # hex:    count raw bytes returned as a hex string
+    # scalar: one struct code returned as is
+    # bigint: count bytes returned as a signed little endian int
+    # const:  nothing is read, value is returned
+    # property / property_value: name idx, type idx, an int32 when padded and
+    #   the element, returned as (name, type_name, value) or just the value
+    kind: str
+    code: str = ""
+    count: int = 0
+    value: Any = None
+    element: str = "Float"
+    padded: bool = False
+
+
+@dataclass
+class Layout:
+    # size_multiple: first variant whose size divides the remaining size,
+    #   otherwise the last one
+    # first_byte: second variant when the leading signed byte is positive,
+    #   otherwise the first one
+    variants: list[list[Field]]
+    container: type = tuple
+    select: str = "size_multiple"
+    structs: list[struct.Struct] = field(init=False, default_factory=list)
+
+    def __post_init__(self):
+        for fields in self.variants:
+            fmt = "<"
+            for f in fields:
+                if f.kind == "skip":
+                    fmt += f"{f.count}x"
+                elif f.kind in ("hex", "bigint"):
+                    fmt += f"{f.count}s"
+                elif f.kind == "scalar":
+                    fmt += f.code
+                elif f.kind in ("property", "property_value"):
+                    fmt += "hhi" if f.padded else "hh"
+                    fmt += ELEMENTS[f.element][0]
+            self.structs.append(struct.Struct(fmt))
+
+    def select_variant(self, reader: Reader, size: Size) -> int:
+        if self.select == "first_byte":
+            first_byte = int.from_bytes(reader.peek(1), "little", signed=True)
+            return 1 if first_byte > 0 else 0
+        for i, compiled in enumerate(self.structs[:-1]):
+            if size.size % compiled.size == 0:
+                return i
+        return len(self.structs) - 1
+
+    def read(self, reader: Reader, size: Size, variable_names: list[str]):
+        variant = self.select_variant(reader, size)
+        compiled = self.structs[variant]
+        try:
+            values = reader.read_struct(compiled)
+        except struct.error:
+            # not enough data left, the caller decodes it field by field
+            return None
+
+        result = []
+        pos = 0
+        for f in self.variants[variant]:
+            if f.kind == "const":
+                result.append(f.value)
+            elif f.kind == "hex":
+                result.append(to_hex(values[pos]))
+                pos += 1
+            elif f.kind == "bigint":
+                result.append(int.from_bytes(values[pos], "little", signed=True))
+                pos += 1
+            elif f.kind == "scalar":
+                result.append(values[pos])
+                pos += 1
+            elif f.kind in ("property", "property_value"):
+                name_idx, type_idx = values[pos], values[pos + 1]
+                pos += 3 if f.padded else 2
+                type_name = variable_names[type_idx - 1]
+                if type_name != f.element:
+                    # not the layout we compiled for, let the caller
+                    # decode it field by field
+                    reader.seek(-compiled.size, 1)
+                    return None
+                value = ELEMENTS[f.element][1](values[pos])
+                pos += 1
+                if f.kind == "property":
+                    name = variable_names[name_idx - 1]
+                    result.append((name, type_name, value))
+                else:
+                    result.append(value)
+
+        size.size -= compiled.size
+        return self.container(result)
+
+
+def properties(kind: str, count: int, padded: bool) -> list[Field]:
+    return [
+        Field(kind="skip", count=1),
+        *[Field(kind=kind, padded=padded) for _ in range(count)],
+        Field(kind="skip", count=2),
+    ]
+
+
+enum_layout = Layout(variants=[[Field(kind="scalar", code="b")] * 2])
+
+LAYOUTS = {
+    "IdTag": Layout(
+        variants=[[Field(kind="hex", count=1), *[Field(kind="scalar", code="i")] * 4]]
+    ),
+    "Vector": Layout(
+        variants=[
+            properties("property", 4, padded=False),
+            properties("property", 4, padded=True),
+        ],
+        container=list,
+    ),
+    "Vector3": Layout(
+        variants=[properties("property", 3, padded=True)],
+        container=list,
+    ),
+    "EulerAngles": Layout(
+        variants=[
+            properties("property_value", 3, padded=False),
+            properties("property_value", 3, padded=True),
+        ],
+        container=list,
+    ),
+    "EntityHandle": Layout(
+        variants=[
+            [
+                Field(kind="scalar", code="b"),
+                Field(kind="const", value=0x00),
+                Field(kind="const", value=None),
+            ],
+            [
+                Field(kind="scalar", code="b"),
+                Field(kind="scalar", code="b"),
+                Field(kind="bigint", count=16),
+            ],
+        ],
+        select="first_byte",
+    ),
+    "eGwintFaction": enum_layout,
+    "EJournalStatus": enum_layout,
+    "EZoneName": enum_layout,
+    "EDifficultyMode": enum_layout,
+    # "W3AbilityManager": Layout(
+    #     variants=[
+    #         [
+    #             Field(kind="scalar", code="i"),
+    #             Field(kind="scalar", code="h"),
+    #             Field(kind="skip", count=4),
+    #         ]
+    #     ]
+    # ),
+}
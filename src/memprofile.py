@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+from collections import defaultdict
+
+from src import utils
+from src.savefile import SaveFile
+from src.utils import BufferPool
+
+
+def measure(func, *args):
+    # peak and retained bytes relative to the traced memory before the call,
+    # the result is returned so retained bytes include it
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    result = func(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    return result, {"peak": peak - before, "retained": current - before}
+
+
+def object_kind(value, hex_ids: set[int]) -> str:
+    # raw data parse_token could not decode is counted apart from strings
+    if id(value) in hex_ids:
+        return "hex_str"
+    return type(value).__name__
+
+
+def count_objects(value, seen: set[int], objects: dict, hex_ids: set[int]):
+    if id(value) in seen:
+        return
+    seen.add(id(value))
+    entry = objects[object_kind(value, hex_ids)]
+    entry["count"] += 1
+    entry["bytes"] += sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            count_objects(item, seen, objects, hex_ids)
+
+
+def parse_with_hex(save_file: SaveFile) -> tuple[list, list[str]]:
+    # parses again with to_hex collecting its strings, kept out of the
+    # measured parse so the collection does not show up in its numbers
+    utils.hex_values = []
+    try:
+        return save_file.parse(), utils.hex_values
+    finally:
+        utils.hex_values = None
+
+
+def profile(filepath: str) -> dict:
+    tracemalloc.start()
+    try:
+        # a private pool so buffers left over from earlier saves are not hits
+        save_file = SaveFile(filepath, pool=BufferPool())
+        phases = {}
+        _, phases["decompress"] = measure(save_file.decompress)
+        tape, phases["index"] = measure(save_file.index)
+        _, phases["parse"] = measure(save_file.parse)
+        _, phases["export"] = measure(save_file.export, os.devnull)
+
+        magics = defaultdict(lambda: {"count": 0, "peak": 0, "retained": 0})
+        for i in tape.roots():
+            _, stats = measure(tape.decode, i)
+            entry = magics[tape.magic(i)]
+            entry["count"] += 1
+            entry["peak"] = max(entry["peak"], stats["peak"])
+            entry["retained"] += stats["retained"]
+    finally:
+        tracemalloc.stop()
+
+    # the hex strings are held by hex_values, so their ids stay valid
+    variable_groups, hex_values = parse_with_hex(save_file)
+    objects = defaultdict(lambda: {"count": 0, "bytes": 0})
+    count_objects(variable_groups, set(), objects, {id(v) for v in hex_values})
+    save_file.close()
+
+    return {
+        "save": os.path.basename(filepath),
+        "phases": phases,
+        "objects": dict(sorted(objects.items())),
+        "magics": dict(sorted(magics.items())),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float, slack: int) -> list[str]:
+    # a number regresses when it grows by more than tolerance and slack bytes,
+    # a name missing from the baseline is reported as new
+    if baseline.get("save") != report["save"]:
+        raise ValueError(
+            f"baseline is for {baseline.get('save')}, not {report['save']}"
+        )
+    regressions = []
+    for section, keys in (
+        ("phases", ("peak", "retained")),
+        ("objects", ("bytes",)),
+        ("magics", ("peak", "retained")),
+    ):
+        old_section = baseline.get(section, {})
+        for name in sorted(report[section].keys() - old_section.keys()):
+            regressions.append(f"new {section}.{name}")
+        for name, old in old_section.items():
+            new = report[section].get(name)
+            if new is None:
+                continue
+            for key in keys:
+                limit = old[key] * (1 + tolerance) + slack
+                if new[key] > limit:
+                    regressions.append(
+                        f"{section}.{name}.{key}: {old[key]} -> {new[key]}"
+                    )
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"{report['save']}")
+    print(f"{'phase':<12}{'peak':>14}{'retained':>14}")
+    for name, stats in report["phases"].items():
+        print(f"{name:<12}{stats['peak']:>14}{stats['retained']:>14}")
+    print(f"{'object':<12}{'count':>14}{'bytes':>14}")
+    for name, stats in report["objects"].items():
+        print(f"{name:<12}{stats['count']:>14}{stats['bytes']:>14}")
+    print(f"{'magic':<12}{'count':>14}{'peak':>14}{'retained':>14}")
+    for name, stats in report["magics"].items():
+        print(
+            f"{name:<12}{stats['count']:>14}{stats['peak']:>14}{stats['retained']:>14}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="profile memory use of a save")
+    parser.add_argument("save")
+    parser.add_argument("--baseline", default="data/memory_baseline.json")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    parser.add_argument("--slack", type=int, default=4096)
+    args = parser.parse_args()
+
+    report = profile(args.save)
+    print_report(report)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare(report, baseline, args.tolerance, args.slack)
+        except ValueError as e:
+            sys.exit(f"cannot compare: {e}")
+        for regression in regressions:
+            print(f"regression {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
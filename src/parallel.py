@@ -0,0 +1,105 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from src.parser import VariableParser, unknown_types
+from src.utils import Reader, Size
+
+# per worker process state, set up once by init_worker. the reader reads the
+# shared memory in place, so the mapping is kept open for the worker's life
+worker_shm: shared_memory.SharedMemory | None = None
+worker_reader: Reader | None = None
+worker_parser: VariableParser | None = None
+
+
+def top_level_groups(variable_table_entries: list[tuple[int, int]]):
+    # entries are sorted by offset, an entry that starts inside the
+    # offset/size extent of an earlier one is nested in it and stays in its
+    # group. returns (extent in bytes, entries) per top-level entry
+    groups = []
+    group_start = 0
+    group_end = -1
+    for i, (offset, size) in enumerate(variable_table_entries):
+        if offset >= group_end:
+            if groups:
+                groups[-1] = (group_end - group_start, groups[-1][1])
+            groups.append((0, []))
+            group_start = offset
+        groups[-1][1].append((i, offset, size))
+        group_end = max(group_end, offset + size)
+    if groups:
+        groups[-1] = (group_end - group_start, groups[-1][1])
+    return groups
+
+
+def split_shards(variable_table_entries: list[tuple[int, int]], shard_count: int):
+    # shards are only cut between top-level groups, balanced by their extent
+    groups = top_level_groups(variable_table_entries)
+    target = sum(extent for extent, _ in groups) / max(shard_count, 1)
+    shards = []
+    shard = []
+    shard_bytes = 0
+    for extent, entries in groups:
+        shard.extend(entries)
+        shard_bytes += extent
+        if shard_bytes >= target and len(shards) < shard_count - 1:
+            shards.append(shard)
+            shard = []
+            shard_bytes = 0
+    if shard:
+        shards.append(shard)
+    return shards
+
+
+def init_worker(shm_name: str, data_size: int, variable_names: list[str]):
+    global worker_shm, worker_reader, worker_parser
+    worker_shm = shared_memory.SharedMemory(name=shm_name)
+    worker_reader = Reader(worker_shm.buf[:data_size])
+    worker_parser = VariableParser(variable_names=variable_names)
+
+
+def parse_shard(shard: list[tuple[int, int, int]]):
+    # same skipping rule as SaveFile.parse, but relative to the start of the
+    # shard, the merge step fixes up an entry that ran past its group
+    results = []
+    cur_pos = None
+    for i, offset, size in shard:
+        if cur_pos is not None and offset < cur_pos:
+            continue
+        worker_reader.seek(offset)
+        variable = worker_parser.parse(worker_reader, Size(size))
+        cur_pos = worker_reader.tell()
+        results.append((i, cur_pos, variable))
+    return results, unknown_types
+
+
+def parse_shards(
+    data: bytearray,
+    variable_names: list[str],
+    variable_table_entries: list[tuple[int, int]],
+    workers: int,
+) -> dict[int, tuple[int, object]]:
+    shards = split_shards(variable_table_entries, workers)
+    if len(shards) < 2:
+        # a single top-level group, nothing to run in parallel
+        return {}
+
+    shm = shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        shm.buf[: len(data)] = data
+        with ProcessPoolExecutor(
+            max_workers=len(shards),
+            initializer=init_worker,
+            initargs=(shm.name, len(data), variable_names),
+        ) as executor:
+            shard_results = list(executor.map(parse_shard, shards))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # entry index -> (end offset, parsed variable)
+    parsed = {}
+    for results, types in shard_results:
+        unknown_types.update(types)
+        for i, end_pos, variable in results:
+            parsed[i] = (end_pos, variable)
+    return parsed
@@ -4,7 +4,8 @@ from dataclasses import dataclass
 from typing import Any
 from uuid import UUID
 
-from src.utils import Reader, Size
+from src.layouts import LAYOUTS
+from src.utils import Reader, Size, to_hex
 
 logger = logging.getLogger(__name__)
 unknown_types = set()
@@ -102,15 +103,24 @@ def parse_token(reader: Reader, type_name: str, size: Size, variable_names: list
 
     if type_name == "EngineTime":
         size.size -= 3
-        return reader.read(3).hex()
+        return to_hex(reader.read(3))
 
     if type_name == "GameTime":
         value = reader.read(size.size)
         size.size = 0
-        return value.hex()
+        return to_hex(value)
 
+    layout = LAYOUTS.get(type_name)
+    if layout is not None:
+        value = layout.read(reader, size, variable_names)
+        if value is not None:
+            return value
+
+    # field by field decoding, used when a property of a composite does not
+    # hold the element type its layout was compiled for or the value is cut
+    # short
     if type_name == "IdTag":
-        value = [reader.read(1).hex()]
+        value = [to_hex(reader.read(1))]
         for _ in range(4):
             value.append(reader.read_int32())
         size.size -= 17
@@ -188,6 +198,12 @@ def parse_token(reader: Reader, type_name: str, size: Size, variable_names: list
             size.size -= 17
         return unknown1, unknown2, unknown3
 
+    if type_name in {"eGwintFaction", "EJournalStatus", "EZoneName", "EDifficultyMode"}:
+        unknown1 = reader.read_int(1)
+        unknown2 = reader.read_int(1)
+        size.size -= 2
+        return unknown1, unknown2
+
     if type_name == "TagList":
         taglist_header = reader.read_int(1)
         size.size -= 1
@@ -202,12 +218,6 @@ def parse_token(reader: Reader, type_name: str, size: Size, variable_names: list
 
         return taglist_flag, taglist_entries
 
-    if type_name in {"eGwintFaction", "EJournalStatus", "EZoneName", "EDifficultyMode"}:
-        unknown1 = reader.read_int(1)
-        unknown2 = reader.read_int(1)
-        size.size -= 2
-        return unknown1, unknown2
-
     if type_name == "W3EnvironmentManager":
         _unknown_1 = reader.read(1)
         size.size -= 1
@@ -250,12 +260,12 @@ def parse_token(reader: Reader, type_name: str, size: Size, variable_names: list
         return array
 
     if type_name == "SActionPointId":
-        unknown1 = reader.read(1)
+        reader.read(1)
         unknown2 = reader.read_int16()
         size.size -= 3
         unknown3 = 0
         if unknown2 > 0:
-            unknown3 = reader.read(40).hex()
+            unknown3 = to_hex(reader.read(40))
             size.size -= 40
         return unknown3
 
@@ -284,12 +294,7 @@ def parse_token(reader: Reader, type_name: str, size: Size, variable_names: list
         else:
             unknown = reader.read(size.size)
             size.size = 0
-            return unknown.hex()
-
-    # if type_name == "W3AbilityManager":
-    #     value_size = reader.read_int32()
-    #     unknown = reader.read_int16()
-    #     padding = reader.read_int32()
+            return to_hex(unknown)
 
     if type_name.startswith("handle:"):
         handle_type = type_name.removeprefix("handle:")
@@ -310,7 +315,7 @@ def parse_token(reader: Reader, type_name: str, size: Size, variable_names: list
 
     unknown_types.add(type_name)
     print(reader.tell(), type_name)
-    value = reader.read(size.size).hex()
+    value = to_hex(reader.read(size.size))
     size.size = 0
     return value
 
@@ -569,7 +574,7 @@ class VariableParser(VariableParserBase):
         parser = self.parsers.get(magic)
         if parser is not None:
             return parser.parse(reader, size)
-        variable = magic, "UNKNOWN", reader.read(size.size).hex()
+        variable = magic, "UNKNOWN", to_hex(reader.read(size.size))
         size.size = 0
         return variable
 
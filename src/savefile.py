@@ -1,23 +1,50 @@
 import json
 import logging
+import os
 
 import lz4.block
 
+from src.parallel import parse_shards
 from src.parser import MANUVariableParser, Variable, VariableParser
-from src.utils import Reader, Size
+from src.tape import Tape
+from src.utils import BufferPool, Reader, Size
 
 logger = logging.getLogger(__name__)
+buffer_pool = BufferPool()
+# an lz4 block expands to at most about 255 times its compressed size
+MAX_LZ4_RATIO = 256
 
 
 class SaveFile:
     header_size = 0
     filepath: str | None = None
-    data = bytearray()
+    variable_groups: list | None = None
 
-    def __init__(self, filepath):
+    def __init__(self, filepath, pool: BufferPool | None = None):
         self.filepath = filepath
+        self.pool = pool if pool is not None else buffer_pool
+        # pooled buffers are rounded up to a size class, data is a view of
+        # the bytes in use
+        self.buffer: bytearray | None = None
+        self.data = memoryview(b"")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.buffer is None:
+            return
+        # readers and tapes made from data share the buffer, while any of
+        # them is alive the pool leaves the buffer to the allocator
+        self.data = memoryview(b"")
+        self.pool.release(self.buffer)
+        self.buffer = None
 
     def decompress(self):
+        self.close()
         with Reader(open(self.filepath, "rb").read()) as file:
             # verify SNFHFZLC are the starting magic bytes
             snfhfzlc = file.read_string(8)
@@ -26,6 +53,10 @@ class SaveFile:
             # chunk_count, header_size
             chunk_count = file.read_int32()
             self.header_size = file.read_int32()
+            # the sizes are checked against the file before allocating for them
+            file_size = len(file.view)
+            if not 0 <= chunk_count <= (file_size - file.tell()) // 12:
+                raise ValueError(f"invalid chunk count: {chunk_count}")
 
             chunk_metadata = []
             # get chunk metadata, need to do this here before seeking
@@ -36,8 +67,28 @@ class SaveFile:
                 eof_offset = file.read_int32()
                 chunk_metadata.append((compressed_size, uncompressed_size, eof_offset))
 
+            if not file.tell() <= self.header_size <= file_size:
+                raise ValueError(f"invalid header size: {self.header_size}")
+            compressed_total = 0
+            data_size = self.header_size
+            for compressed_size, uncompressed_size, _ in chunk_metadata:
+                if compressed_size < 0 or uncompressed_size < 0:
+                    raise ValueError("negative chunk size")
+                compressed_total += compressed_size
+                if 0 < compressed_size < uncompressed_size:
+                    if uncompressed_size > compressed_size * MAX_LZ4_RATIO:
+                        raise ValueError(
+                            f"chunk of {compressed_size} bytes cannot "
+                            f"decompress to {uncompressed_size} bytes"
+                        )
+                    data_size += uncompressed_size
+            if self.header_size + compressed_total > file_size:
+                raise ValueError("chunks extend past the end of the file")
+            self.buffer = self.pool.acquire(data_size)
+
             file.seek(0)
-            self.data.extend(file.read(self.header_size))
+            self.buffer[: self.header_size] = file.read(self.header_size)
+            pos = self.header_size
 
             file.seek(self.header_size, 0)
             # uncompress chunks
@@ -49,10 +100,12 @@ class SaveFile:
                         raw_data, uncompressed_size=uncompressed_size
                     )
                     assert len(chunk_data) == uncompressed_size
-                    self.data.extend(chunk_data)
+                    self.buffer[pos : pos + uncompressed_size] = chunk_data
+                    pos += uncompressed_size
 
-    def parse(self):
-        reader = Reader(self.data)
+            self.data = memoryview(self.buffer)[:data_size]
+
+    def read_tables(self, reader: Reader) -> list[tuple[int, int]]:
         reader.seek(self.header_size)
         _header_start = reader.tell()
         magic = reader.read_string(4)
@@ -104,10 +157,33 @@ class SaveFile:
 
         assert len(variable_table_entries) == entry_count
         variable_table_entries.sort(key=lambda item: item[0])
+        return variable_table_entries
+
+    def index(self) -> Tape:
+        reader = Reader(self.data)
+        variable_table_entries = self.read_tables(reader)
+        tape = Tape(self.data, self.variable_names)
+        tape.index_entries(variable_table_entries)
+        return tape
+
+    def parse(self, workers: int | None = None):
+        reader = Reader(self.data)
+        variable_table_entries = self.read_tables(reader)
 
         variables: list[Variable] = []
         variable_parser = VariableParser(variable_names=self.variable_names)
 
+        # entries parsed ahead of time by worker processes, the loop below
+        # still decides which of them are kept so the result is the same
+        parsed = {}
+        if workers is not None:
+            # more workers than cores only adds process overhead
+            workers = min(workers, os.cpu_count() or 1)
+        if workers is not None and workers > 1:
+            parsed = parse_shards(
+                self.data, self.variable_names, variable_table_entries, workers
+            )
+
         for i in range(len(variable_table_entries)):
             cur_pos = reader.tell()
             offset, size = variable_table_entries[i]
@@ -120,8 +196,12 @@ class SaveFile:
             if i > 0 and offset < cur_pos:
                 continue
 
-            reader.seek(offset)
-            variable = variable_parser.parse(reader, read_token_size)
+            if i in parsed:
+                end_pos, variable = parsed[i]
+                reader.seek(end_pos)
+            else:
+                reader.seek(offset)
+                variable = variable_parser.parse(reader, read_token_size)
 
             if variable:
                 v = Variable(variable=variable, size=size, token_size=token_size)
@@ -145,4 +225,9 @@ class SaveFile:
 
             variable_groups.append(group)
 
-        json.dump(variable_groups, open("data/data.json", "w"), indent=4)
+        self.variable_groups = variable_groups
+        return variable_groups
+
+    def export(self, filepath="data/data.json"):
+        with open(filepath, "w") as f:
+            json.dump(self.variable_groups, f, indent=4)
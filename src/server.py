@@ -0,0 +1,426 @@
+import argparse
+import json
+import logging
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from src.savefile import SaveFile
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class RawJSON:
+    # a result that is already serialized, written into the response as is
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+class OpenSave:
+    def __init__(self, filepath: str, mtime: float):
+        self.filepath = filepath
+        self.mtime = mtime
+        # guards users and evicted, the save is closed once it has been
+        # evicted and the last request using it is done
+        self.lock = threading.Lock()
+        self.users = 0
+        self.evicted = False
+        self.load_lock = threading.Lock()
+        self.export_lock = threading.Lock()
+
+        self.save_file: SaveFile | None = None
+        self.tape = None
+        self.roots = array("l")
+        self.by_name: dict[str, array] = {}
+        self.by_magic: dict[str, array] = {}
+        self.by_name_magic: dict[tuple[str, str], array] = {}
+        self.values = {}
+        self.export_json: bytes | None = None
+
+    def __enter__(self):
+        with self.lock:
+            self.users += 1
+        try:
+            self.load()
+        except BaseException:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.users -= 1
+            if self.evicted and self.users == 0:
+                self.close()
+
+    def evict(self):
+        with self.lock:
+            self.evicted = True
+            if self.users == 0:
+                self.close()
+
+    def load(self):
+        # loaded once, after that requests only read the tape and the indexes
+        with self.load_lock:
+            if self.tape is not None:
+                return
+            save_file = SaveFile(self.filepath)
+            try:
+                save_file.decompress()
+                tape = save_file.index()
+            except BaseException:
+                # return the buffer to the pool, nothing else holds it
+                save_file.close()
+                raise
+
+            names = {}
+            by_name = {}
+            by_magic = {}
+            by_name_magic = {}
+            for i, (name_idx, magic_idx) in enumerate(
+                zip(tape.name_idxs, tape.magics, strict=True)
+            ):
+                if name_idx not in names:
+                    names[name_idx] = tape.get_name(name_idx)
+                name = names[name_idx]
+                magic = tape.magic_names[magic_idx]
+                by_name.setdefault(name, array("l")).append(i)
+                by_magic.setdefault(magic, array("l")).append(i)
+                by_name_magic.setdefault((name, magic), array("l")).append(i)
+
+            self.roots = array("l", tape.roots())
+            self.by_name = by_name
+            self.by_magic = by_magic
+            self.by_name_magic = by_name_magic
+            self.save_file = save_file
+            self.tape = tape
+
+    def close(self):
+        # the tape holds a view of the buffer, drop it first so the save can
+        # return the buffer to the pool
+        save_file = self.save_file
+        self.save_file = None
+        self.tape = None
+        self.roots = array("l")
+        self.by_name = {}
+        self.by_magic = {}
+        self.by_name_magic = {}
+        self.values = {}
+        self.export_json = None
+        if save_file is not None:
+            save_file.close()
+
+    def record(self, i: int) -> dict:
+        tape = self.tape
+        return {
+            "index": i,
+            "magic": tape.magic(i),
+            "name": tape.name(i),
+            "type": tape.type_name(i),
+            "start": tape.starts[i],
+            "end": tape.ends[i],
+            "parent": tape.parent(i),
+        }
+
+    def value(self, i: int):
+        if i not in self.values:
+            self.values[i] = self.tape.value(i)
+        return self.values[i]
+
+    def export(self) -> bytes:
+        with self.export_lock:
+            if self.export_json is None:
+                self.export_json = json.dumps(self.save_file.parse()).encode()
+                # the serialized form is all that is served, drop the tree
+                self.save_file.variable_groups = None
+            return self.export_json
+
+
+class SaveCache:
+    def __init__(self, max_saves: int = 8):
+        self.max_saves = max_saves
+        self.saves: OrderedDict[str, OpenSave] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, filepath: str) -> OpenSave:
+        filepath = os.path.abspath(filepath)
+        mtime = os.stat(filepath).st_mtime
+        evicted = []
+        with self.lock:
+            save = self.saves.get(filepath)
+            if save is None or save.mtime != mtime:
+                if save is not None:
+                    evicted.append(save)
+                save = OpenSave(filepath, mtime)
+                self.saves[filepath] = save
+            self.saves.move_to_end(filepath)
+            while len(self.saves) > self.max_saves:
+                evicted.append(self.saves.popitem(last=False)[1])
+
+        for old in evicted:
+            old.evict()
+        return save
+
+
+def is_int(value) -> bool:
+    # bool is an int subclass, true would otherwise select record 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class SaveService:
+    def __init__(self, cache: SaveCache):
+        self.cache = cache
+        self.methods = {
+            "get": self.get,
+            "find": self.find,
+            "list": self.list,
+            "export": self.export,
+        }
+
+    def open(self, params: dict) -> OpenSave:
+        path = params.get("path")
+        if not isinstance(path, str):
+            raise RPCError(INVALID_PARAMS, "path must be a string")
+        return self.cache.get(path)
+
+    def index(self, save: OpenSave, params: dict, name: str) -> int:
+        i = params.get(name)
+        if not is_int(i) or not 0 <= i < len(save.tape):
+            raise RPCError(INVALID_PARAMS, f"invalid record index: {i}")
+        return i
+
+    def page(self, params: dict) -> tuple[int, int]:
+        offset = params.get("offset", 0)
+        limit = params.get("limit", DEFAULT_LIMIT)
+        if not is_int(offset) or offset < 0:
+            raise RPCError(INVALID_PARAMS, f"invalid offset: {offset}")
+        if not is_int(limit) or not 0 < limit <= MAX_LIMIT:
+            raise RPCError(INVALID_PARAMS, f"limit must be 1 to {MAX_LIMIT}")
+        return offset, limit
+
+    def records(self, save: OpenSave, indexes, offset: int, limit: int) -> dict:
+        # one past the page is read to tell whether there is more
+        if isinstance(indexes, (array, range, tuple)):
+            page = list(indexes[offset : offset + limit + 1])
+        else:
+            page = list(islice(indexes, offset, offset + limit + 1))
+        next_offset = offset + limit if len(page) > limit else None
+        return {
+            "records": [save.record(i) for i in page[:limit]],
+            "next_offset": next_offset,
+        }
+
+    def get(self, params: dict):
+        with self.open(params) as save:
+            i = self.index(save, params, "index")
+            return {"record": save.record(i), "value": save.value(i)}
+
+    def find(self, params: dict):
+        name = params.get("name")
+        magic = params.get("magic")
+        for key, value in (("name", name), ("magic", magic)):
+            if value is not None and not isinstance(value, str):
+                raise RPCError(INVALID_PARAMS, f"{key} must be a string")
+        offset, limit = self.page(params)
+        with self.open(params) as save:
+            if name is not None and magic is not None:
+                indexes = save.by_name_magic.get((name, magic), ())
+            elif name is not None:
+                indexes = save.by_name.get(name, ())
+            elif magic is not None:
+                indexes = save.by_magic.get(magic, ())
+            else:
+                indexes = range(len(save.tape))
+            return self.records(save, indexes, offset, limit)
+
+    def list(self, params: dict):
+        offset, limit = self.page(params)
+        with self.open(params) as save:
+            if params.get("parent") is None:
+                indexes = save.roots
+            else:
+                indexes = save.tape.children(self.index(save, params, "parent"))
+            return self.records(save, indexes, offset, limit)
+
+    def export(self, params: dict):
+        with self.open(params) as save:
+            return RawJSON(save.export())
+
+    def dispatch(self, request) -> dict:
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or "method" not in request:
+                raise RPCError(INVALID_REQUEST, "invalid request")
+            method_name = request["method"]
+            method = self.methods.get(method_name)
+            if method is None:
+                raise RPCError(METHOD_NOT_FOUND, f"unknown method: {method_name}")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "params must be an object")
+            result = method(params)
+        except RPCError as e:
+            return error_response(request_id, e.code, str(e))
+        except Exception as e:
+            logger.exception("request failed")
+            return error_response(request_id, SERVER_ERROR, repr(e))
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def error_response(request_id, code: int, message: str) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": code, "message": message},
+    }
+
+
+def encode_response(response: dict) -> bytes:
+    result = response.get("result")
+    if not isinstance(result, RawJSON):
+        return json.dumps(response).encode()
+    request_id = json.dumps(response["id"]).encode()
+    return (
+        b'{"jsonrpc": "2.0", "id": ' + request_id + b', "result": ' + result.data + b"}"
+    )
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    # keep connections open so repeated queries skip the handshake, each
+    # connection has its own thread so idle ones do not hold up requests
+    protocol_version = "HTTP/1.1"
+    timeout = 60
+    # send headers and body in one write, avoids the delayed ack stall
+    wbufsize = -1
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError(f"invalid Content-Length: {length}")
+        except ValueError as e:
+            response = error_response(None, INVALID_REQUEST, str(e))
+            # the body cannot be found without a length, do not reuse the
+            # connection
+            self.close_connection = True
+        else:
+            try:
+                request = json.loads(self.rfile.read(length))
+            except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                response = error_response(None, PARSE_ERROR, str(e))
+            else:
+                future = self.server.executor.submit(
+                    self.server.service.dispatch, request
+                )
+                response = future.result()
+
+        body = encode_response(response)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # unix socket clients have no address
+        return str(self.client_address or self.server.server_address)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+class ThreadPoolMixIn:
+    # connections are served by a thread each, the requests on them run on a
+    # bounded pool
+    daemon_threads = True
+    workers = 8
+
+    def server_activate(self):
+        super().server_activate()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def server_close(self):
+        super().server_close()
+        if hasattr(self, "executor"):
+            self.executor.shutdown(wait=True)
+
+
+class ThreadPoolHTTPServer(ThreadPoolMixIn, ThreadingHTTPServer):
+    pass
+
+
+class ThreadPoolUnixServer(ThreadPoolMixIn, ThreadingMixIn, UnixStreamServer):
+    pass
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    socket_path: str | None = None,
+    max_saves: int = 8,
+    workers: int = 8,
+):
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = ThreadPoolUnixServer(socket_path, RequestHandler, False)
+    else:
+        server = ThreadPoolHTTPServer((host, port), RequestHandler, False)
+    server.workers = workers
+    try:
+        server.server_bind()
+        server.server_activate()
+    except BaseException:
+        server.server_close()
+        raise
+    server.service = SaveService(SaveCache(max_saves=max_saves))
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="serve parsed saves over JSON-RPC")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", dest="socket_path")
+    parser.add_argument("--max-saves", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = make_server(
+        host=args.host,
+        port=args.port,
+        socket_path=args.socket_path,
+        max_saves=args.max_saves,
+        workers=args.workers,
+    )
+    logger.info(f"listening on {server.server_address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,230 @@
+from array import array
+from collections.abc import Iterator
+
+from src.parser import VariableParser, parse_token
+from src.utils import Reader, Size
+
+# records the tape knows the layout of, anything else found by get_magic is
+# consumed by its parser and stored as a leaf. magics without a parser share
+# the UNKNOWN slot so a corrupt save cannot grow magic_names
+TAPE_MAGICS = ("BLCK", "SS", "ROTS", "PORP", "AVAL", "VL", "OP", "BS")
+UNKNOWN_MAGIC = "UNKNOWN"
+# stored for records without a name or type, outside the range of the int16
+# indexes read from the save
+NO_INDEX = -1 << 16
+
+
+# flat index of the record structure of a save, built without decoding PORP
+# and AVAL values. records are stored in pre-order, one slot per array
+class Tape:
+    def __init__(self, data: bytes | bytearray | memoryview, variable_names: list[str]):
+        # shares the buffer of the save, it must stay open while the tape is used
+        self.data = data
+        self.reader = Reader(data)
+        self.variable_names = variable_names
+        self.variable_parser = VariableParser(variable_names=variable_names)
+        self.magic_names = list(TAPE_MAGICS)
+        for magic in self.variable_parser.parsers:
+            if magic not in self.magic_names:
+                self.magic_names.append(magic)
+        self.magic_names.append(UNKNOWN_MAGIC)
+
+        self.magics = array("B")
+        # 1-based indexes into variable_names, NO_INDEX when the record has none
+        self.name_idxs = array("l")
+        self.type_idxs = array("l")
+        self.starts = array("q")
+        self.ends = array("q")
+        self.parents = array("l")
+        # index one past the last descendant of a record
+        self.skips = array("l")
+        # the size budget the record was parsed with, needed to decode it
+        # the same way VariableParser does
+        self.budgets = array("q")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def index_entries(self, variable_table_entries: list[tuple[int, int]]):
+        # same skipping rule as SaveFile.parse, entries nested in a record
+        # that was already indexed are not roots
+        cur_pos = None
+        for offset, size in variable_table_entries:
+            if cur_pos is not None and offset < cur_pos:
+                continue
+            self.reader.seek(offset)
+            self.index_record(self.reader, Size(size), -1)
+            cur_pos = self.reader.tell()
+
+    def index_record(self, reader: Reader, size: Size, parent: int):
+        start = reader.tell()
+        budget = size.size
+        magic = self.variable_parser.get_magic(reader)
+
+        if magic == "BLCK":
+            reader.read(4)
+            name_idx = reader.read_int(2, False)
+            self.lookup(name_idx)
+            blck_size = reader.read_int(2, False)
+            reader.read_int(2, False)
+            size.size -= 4 + 2 * 3
+            rec = self.add(magic, name_idx, NO_INDEX, start, budget, parent)
+            read_value_size = Size(blck_size)
+            while read_value_size.size > 0:
+                self.index_record(reader, read_value_size, rec)
+            size.size -= blck_size
+
+        elif magic == "ROTS":
+            reader.read(4)
+            value_size = reader.read_int32()
+            size.size -= 8
+            rec = self.add(magic, NO_INDEX, NO_INDEX, start, budget, parent)
+            read_value_size = Size(value_size)
+            while read_value_size.size > 0:
+                self.index_record(reader, read_value_size, rec)
+            size.size -= value_size
+            reader.read(4)
+            size.size -= 4
+
+        elif magic == "SS":
+            reader.read(2)
+            reader.read_int32()
+            size.size -= 6
+            rec = self.add(magic, NO_INDEX, NO_INDEX, start, budget, parent)
+            # children share the budget of the enclosing record
+            while size.size > 0:
+                self.index_record(reader, size, rec)
+
+        elif magic in ("PORP", "AVAL"):
+            reader.read(4)
+            name_idx = reader.read_int16()
+            type_idx = reader.read_int16()
+            value_size = reader.read_int32()
+            size.size -= 12
+            self.lookup(name_idx)
+            self.lookup(type_idx)
+            rec = self.add(magic, name_idx, type_idx, start, budget, parent)
+            reader.seek(value_size, 1)
+            size.size -= value_size
+
+        elif magic == "VL":
+            # VL and OP carry no size field, the value has to be walked to
+            # find where the record ends
+            reader.read(2)
+            name_idx = reader.read_int16()
+            type_idx = reader.read_int16()
+            size.size -= 6
+            self.lookup(name_idx)
+            type_name = self.lookup(type_idx)
+            rec = self.add(magic, name_idx, type_idx, start, budget, parent)
+            parse_token(reader, type_name, size, self.variable_names)
+
+        elif magic == "OP":
+            # unlike VL, OPVariableParser reads the indexes unsigned and
+            # decodes a bad one as Unknown
+            reader.read(2)
+            name_idx = reader.read_int(2, False)
+            type_idx = reader.read_int(2, False)
+            size.size -= 6
+            rec = self.add(magic, name_idx, type_idx, start, budget, parent)
+            parse_token(reader, self.get_name(type_idx), size, self.variable_names)
+
+        elif magic == "BS":
+            reader.read(2)
+            name_idx = reader.read_int16()
+            size.size -= 4
+            self.lookup(name_idx)
+            rec = self.add(magic, name_idx, NO_INDEX, start, budget, parent)
+
+        else:
+            if magic not in self.variable_parser.parsers:
+                magic = UNKNOWN_MAGIC
+            rec = self.add(magic, NO_INDEX, NO_INDEX, start, budget, parent)
+            self.variable_parser.parse(reader, size)
+
+        self.ends[rec] = reader.tell()
+        self.skips[rec] = len(self)
+
+    def add(
+        self,
+        magic: str,
+        name_idx: int,
+        type_idx: int,
+        start: int,
+        budget: int,
+        parent: int,
+    ) -> int:
+        self.magics.append(self.magic_names.index(magic))
+        self.name_idxs.append(name_idx)
+        self.type_idxs.append(type_idx)
+        self.starts.append(start)
+        self.ends.append(start)
+        self.parents.append(parent)
+        self.skips.append(0)
+        self.budgets.append(budget)
+        return len(self) - 1
+
+    def lookup(self, idx: int) -> str:
+        # resolves an index the way the VariableParser classes do, so a bad
+        # one raises while indexing just as it does in SaveFile.parse
+        return self.variable_names[idx - 1]
+
+    def get_name(self, idx: int) -> str:
+        if idx == NO_INDEX:
+            return ""
+        try:
+            return self.lookup(idx)
+        except IndexError:
+            return "Unknown"
+
+    def magic(self, i: int) -> str:
+        return self.magic_names[self.magics[i]]
+
+    def name(self, i: int) -> str:
+        return self.get_name(self.name_idxs[i])
+
+    def type_name(self, i: int) -> str:
+        return self.get_name(self.type_idxs[i])
+
+    def parent(self, i: int) -> int:
+        return self.parents[i]
+
+    def roots(self) -> Iterator[int]:
+        i = 0
+        while i < len(self):
+            yield i
+            i = self.skips[i]
+
+    def children(self, i: int) -> Iterator[int]:
+        j = i + 1
+        while j < self.skips[i]:
+            yield j
+            j = self.skips[j]
+
+    def count(self, magic: str | None = None) -> int:
+        if magic is None:
+            return len(self)
+        if magic not in self.magic_names:
+            return 0
+        return self.magics.count(self.magic_names.index(magic))
+
+    # value and decode use a reader of their own so they can run from several
+    # threads at once
+    def value(self, i: int):
+        magic = self.magic(i)
+        start = self.starts[i]
+        reader = Reader(self.data)
+        if magic in ("PORP", "AVAL"):
+            reader.seek(start + 8)
+            value_size = Size(reader.read_int32())
+        elif magic in ("VL", "OP"):
+            reader.seek(start + 6)
+            value_size = Size(self.budgets[i] - 6)
+        else:
+            return self.decode(i)
+        return parse_token(reader, self.type_name(i), value_size, self.variable_names)
+
+    def decode(self, i: int):
+        reader = Reader(self.data)
+        reader.seek(self.starts[i])
+        return self.variable_parser.parse(reader, Size(self.budgets[i]))
@@ -1,5 +1,6 @@
+import struct
+import threading
 from dataclasses import dataclass
-from io import BytesIO
 
 
 @dataclass
@@ -7,9 +8,51 @@ class Size:
     size: int = 0
 
 
-class Reader(BytesIO):
+# set to a list by memprofile to collect the strings to_hex returns, so raw
+# data can be counted apart from decoded strings. None otherwise
+hex_values: list[str] | None = None
+
+
+def to_hex(data: bytes) -> str:
+    value = data.hex()
+    if hex_values is not None:
+        hex_values.append(value)
+    return value
+
+
+# reads from a memoryview over the data instead of copying it like BytesIO,
+# several readers can share one buffer
+class Reader:
     def __init__(self, initial_bytes=b"") -> None:
-        super().__init__(initial_bytes)
+        self.view = memoryview(initial_bytes)
+        self.pos = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def read(self, size=-1) -> bytes:
+        end = len(self.view)
+        if size is not None and size >= 0:
+            end = min(self.pos + size, end)
+        data = bytes(self.view[self.pos : end])
+        self.pos = max(self.pos, end)
+        return data
+
+    def seek(self, offset, whence=0) -> int:
+        if whence == 1:
+            offset += self.pos
+        elif whence == 2:
+            offset += len(self.view)
+        if offset < 0:
+            raise ValueError(f"negative seek value {offset}")
+        self.pos = offset
+        return self.pos
+
+    def tell(self) -> int:
+        return self.pos
 
     def read_string(self, size) -> str:
         return self.read(size).decode()
@@ -23,6 +66,11 @@ class Reader(BytesIO):
     def read_int(self, size, signed=True) -> int:
         return int.from_bytes(self.read(size), "little", signed=signed)
 
+    def read_struct(self, compiled: struct.Struct) -> tuple:
+        values = compiled.unpack_from(self.view, self.pos)
+        self.pos += compiled.size
+        return values
+
     def peek_string(self, size) -> str:
         try:
             s = self.read(size).decode()
@@ -36,3 +84,69 @@ class Reader(BytesIO):
         s = self.read(size)
         self.seek(-size, 1)
         return s
+
+
+class BufferPool:
+    # smallest size class handed out, smaller requests are rounded up to it
+    min_size = 64 * 1024
+
+    def __init__(self, max_retained_bytes: int = 512 * 1024 * 1024):
+        self.max_retained_bytes = max_retained_bytes
+        self.retained_bytes = 0
+        self.free: dict[int, list[bytearray]] = {}
+        self.hits = 0
+        self.misses = 0
+        # releases refused because the buffer was still in use
+        self.exported = 0
+        self.lock = threading.Lock()
+
+    def size_class(self, size: int) -> int:
+        # eight classes per power of two, so at most 1/8 of a buffer is unused
+        size = max(self.min_size, size)
+        step = 1 << max((size - 1).bit_length() - 4, 0)
+        return -(-size // step) * step
+
+    def acquire(self, size: int) -> bytearray:
+        size_class = self.size_class(size)
+        with self.lock:
+            buffers = self.free.get(size_class)
+            if buffers:
+                self.hits += 1
+                self.retained_bytes -= size_class
+                return buffers.pop()
+            self.misses += 1
+        return bytearray(size_class)
+
+    def release(self, buffer: bytearray):
+        # a buffer with live views (a Tape or a Reader still holding it) is
+        # left to the allocator, reusing it would let those views read the
+        # next save's bytes. resizing raises BufferError while views exist
+        try:
+            buffer.append(0)
+            buffer.pop()
+        except BufferError:
+            with self.lock:
+                self.exported += 1
+            return
+        size_class = len(buffer)
+        with self.lock:
+            # buffers over the cap are left to the allocator
+            if self.retained_bytes + size_class > self.max_retained_bytes:
+                return
+            self.free.setdefault(size_class, []).append(buffer)
+            self.retained_bytes += size_class
+
+    def clear(self):
+        with self.lock:
+            self.free.clear()
+            self.retained_bytes = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "exported": self.exported,
+                "retained_bytes": self.retained_bytes,
+                "retained_buffers": sum(len(b) for b in self.free.values()),
+            }
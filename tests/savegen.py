@@ -0,0 +1,132 @@
+import struct
+
+import lz4.block
+
+# builds small synthetic saves covering the record and composite types the
+# parser knows, the layout follows SaveFile.read_tables
+
+NAMES = [
+    "a",
+    "Int32",
+    "blk",
+    "Vector",
+    "X",
+    "Y",
+    "Z",
+    "W",
+    "Float",
+    "tag",
+    "IdTag",
+    "EZoneName",
+    "zone",
+    "ea",
+    "EulerAngles",
+    "Pitch",
+    "Yaw",
+    "Roll",
+    "v3",
+    "Vector3",
+    "eh",
+    "EntityHandle",
+]
+HEADER_SIZE = 8 + 8 + 12
+
+
+def idx(name):
+    return NAMES.index(name) + 1
+
+
+def vl(name, type_name, payload):
+    return b"VL" + struct.pack("<hh", idx(name), idx(type_name)) + payload
+
+
+def properties(names, padded, element="Float"):
+    out = b"\x00"
+    for i, name in enumerate(names):
+        out += struct.pack("<hh", idx(name), idx(element))
+        if padded:
+            out += struct.pack("<i", 0)
+        if element == "Float":
+            out += struct.pack("<f", float(i) + 0.5)
+        else:
+            out += struct.pack("<i", i)
+    return out + b"\x00\x00"
+
+
+def vector(padded, element="Float"):
+    return properties(["X", "Y", "Z", "W"], padded, element)
+
+
+def euler(padded):
+    return properties(["Pitch", "Yaw", "Roll"], padded)
+
+
+def sized(magic, name, type_name, value):
+    header = struct.pack("<hhi", idx(name), idx(type_name), len(value))
+    return magic + header + value
+
+
+def build(n_groups=20, base=0):
+    body = b"\0" * base + b"SAV3" + struct.pack("<iii", 1, 2, 3)
+    entries = []
+    for g in range(n_groups):
+        leaf = vl("a", "Int32", struct.pack("<i", g))
+        entries.append((len(body), len(leaf)))
+        body += leaf
+
+        # BLCK whose children are also listed in the variable table
+        inner = b""
+        inner_offsets = []
+        for k in range(3):
+            inner_offsets.append(len(inner))
+            inner += vl("a", "Int32", struct.pack("<i", k))
+        offset = len(body)
+        blck = b"BLCK" + struct.pack("<HHH", idx("blk"), len(inner), 0) + inner
+        entries.append((offset, len(blck)))
+        for inner_offset in inner_offsets:
+            entries.append((offset + 10 + inner_offset, 10))
+        body += blck
+
+        for record in (
+            vl("X", "Vector", vector(padded=False)),
+            vl("X", "Vector", vector(padded=False, element="Int32")),
+            vl("a", "IdTag", b"\x01" + struct.pack("<iiii", 1, -2, 3, g)),
+            vl("zone", "EZoneName", b"\x01\xfe"),
+            vl("ea", "EulerAngles", euler(padded=True)),
+            vl("v3", "Vector3", properties(["X", "Y", "Z"], padded=True)),
+            vl("eh", "EntityHandle", b"\x01\x02" + bytes(range(16))),
+            vl("eh", "EntityHandle", b"\x00"),
+            vl("eh", "EntityHandle", b"\xf0"),
+            sized(b"PORP", "X", "Vector", vector(padded=True)),
+            sized(b"AVAL", "ea", "EulerAngles", euler(padded=False)),
+        ):
+            entries.append((len(body), len(record)))
+            body += record
+
+    nm_offset = len(body)
+    manu = b"MANU" + struct.pack("<ii", len(NAMES), 0)
+    for name in NAMES:
+        manu += bytes([len(name)]) + name.encode()
+    manu += struct.pack("<i", 0) + b"ENOD"
+    body += b"NM" + manu
+    footer_offset = len(body)
+    body += b"\x00" * 10
+    variable_table_offset = len(body)
+    body += struct.pack("<i", len(entries))
+    body += b"".join(struct.pack("<ii", o, s) for o, s in entries)
+    rb_offset = len(body)
+    body += b"RB" + struct.pack("<i", 0)
+    body += struct.pack("<i", variable_table_offset) + b"SE"
+
+    body = bytearray(body)
+    body[footer_offset : footer_offset + 8] = struct.pack("<ii", nm_offset, rb_offset)
+    return bytes(body)
+
+
+def write_save(path, n_groups=20):
+    body = build(n_groups, base=HEADER_SIZE)[HEADER_SIZE:]
+    packed = lz4.block.compress(body, store_size=False)
+    with open(path, "wb") as f:
+        f.write(b"SNFHFZLC" + struct.pack("<ii", 1, HEADER_SIZE))
+        f.write(struct.pack("<iii", len(packed), len(body), 0))
+        f.write(packed)
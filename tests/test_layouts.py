@@ -0,0 +1,41 @@
+import json
+from pathlib import Path
+
+import pytest
+from savegen import NAMES, build, vector
+
+from src.parser import parse_token
+from src.savefile import SaveFile
+from src.utils import Reader, Size
+
+EXPECTED = Path(__file__).parent / "data" / "expected_groups.json"
+
+
+def test_parse_matches_field_by_field_output():
+    # expected_groups.json was written by the parser before composites were
+    # decoded through LAYOUTS, it covers both Vector and EulerAngles variants,
+    # IdTag, EntityHandle and the enums
+    save_file = SaveFile("synthetic")
+    save_file.data = memoryview(build(3))
+    variable_groups = json.loads(json.dumps(save_file.parse()))
+    assert variable_groups == json.loads(EXPECTED.read_text())
+
+
+@pytest.mark.parametrize(
+    "type_name, data, expected",
+    [
+        ("IdTag", b"\x01\x02", ("01", 2, 0, 0, 0)),
+        ("EntityHandle", b"\x01\x02\x03", (1, 2, 3)),
+        ("EZoneName", b"\x01", (1, 0)),
+    ],
+)
+def test_short_value_falls_back_to_field_by_field(type_name, data, expected):
+    assert parse_token(Reader(data), type_name, Size(64), NAMES) == expected
+
+
+def test_other_element_type_falls_back_to_field_by_field():
+    data = vector(padded=False, element="Int32")
+    size = Size(len(data))
+    value = parse_token(Reader(data), "Vector", size, NAMES)
+    assert value == [(name, "Int32", i) for i, name in enumerate("XYZW")]
+    assert size.size == 0
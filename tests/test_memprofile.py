@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+import pytest
+from savegen import build, write_save
+
+from src import utils
+from src.memprofile import compare, count_objects, object_kind, parse_with_hex, profile
+from src.savefile import SaveFile
+
+
+def report(save="a.sav", peak=1000):
+    return {
+        "save": save,
+        "phases": {"parse": {"peak": peak, "retained": 0}},
+        "objects": {},
+        "magics": {},
+    }
+
+
+def test_compare_refuses_another_save():
+    with pytest.raises(ValueError):
+        compare(report(save="a.sav"), report(save="b.sav"), 0.05, 0)
+
+
+def test_compare_reports_growth_and_new_keys():
+    new = report(peak=2000)
+    new["magics"]["BLCK"] = {"count": 1, "peak": 0, "retained": 0}
+    assert compare(new, report(), 0.05, 0) == [
+        "phases.parse.peak: 1000 -> 2000",
+        "new magics.BLCK",
+    ]
+
+
+def test_hex_output_is_counted_apart():
+    save_file = SaveFile("synthetic")
+    save_file.data = memoryview(build(3))
+    variable_groups, hex_values = parse_with_hex(save_file)
+    assert utils.hex_values is None
+    # each group holds one IdTag, its first byte is returned as a plain str
+    assert len(hex_values) == 3
+    assert {type(value) for value in hex_values} == {str}
+    objects = defaultdict(lambda: {"count": 0, "bytes": 0})
+    count_objects(variable_groups, set(), objects, {id(v) for v in hex_values})
+    assert objects["hex_str"]["count"] == 3
+    # a decoded string is not hex just because it looks like it
+    assert object_kind("ab", set()) == "str"
+
+
+def test_profile(tmp_path):
+    path = tmp_path / "synthetic.sav"
+    write_save(path, n_groups=10)
+    result = profile(str(path))
+    assert result["save"] == "synthetic.sav"
+    assert list(result["phases"]) == ["decompress", "index", "parse", "export"]
+    assert all(stats["peak"] > 0 for stats in result["phases"].values())
+    assert result["objects"]["hex_str"]["count"] == 10
+    assert sum(stats["count"] for stats in result["magics"].values()) > 0
+    assert compare(result, result, 0.05, 0) == []
@@ -0,0 +1,33 @@
+import os
+
+from savegen import build
+
+from src.parallel import parse_shards, split_shards
+from src.savefile import SaveFile
+
+
+def load(data: bytes) -> SaveFile:
+    save_file = SaveFile("synthetic")
+    save_file.data = memoryview(data)
+    return save_file
+
+
+def test_shards_are_cut_between_top_level_entries():
+    entries = [(0, 10), (10, 40), (20, 10), (30, 10), (50, 10), (60, 10)]
+    shards = split_shards(entries, 3)
+    starts = [shard[0][0] for shard in shards]
+    # entries 2 and 3 are nested in entry 1 and never start a shard
+    assert 2 not in starts and 3 not in starts
+    assert [i for shard in shards for i, _, _ in shard] == list(range(len(entries)))
+
+
+def test_single_top_level_entry_is_not_sharded():
+    assert parse_shards(b"", [], [(0, 30), (10, 10), (20, 10)], 4) == {}
+
+
+def test_parallel_parse_matches_sequential(monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    data = build(40)
+    sequential = load(data).parse()
+    parallel = load(data).parse(workers=3)
+    assert parallel == sequential
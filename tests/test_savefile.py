@@ -0,0 +1,62 @@
+import struct
+
+import pytest
+from savegen import write_save
+
+from src.savefile import SaveFile
+from src.utils import BufferPool
+
+
+def test_size_classes_waste_at_most_an_eighth():
+    pool = BufferPool()
+    for size in (1, pool.min_size, pool.min_size + 1, 100_000, 3_000_000, 2**30 + 1):
+        size_class = pool.size_class(size)
+        assert size_class >= size
+        assert size_class == pool.min_size or size_class <= size * 9 / 8
+        assert pool.size_class(size_class) == size_class
+
+
+def test_released_buffer_is_reused(tmp_path):
+    path = tmp_path / "synthetic.sav"
+    write_save(path)
+    pool = BufferPool()
+    for _ in range(2):
+        with SaveFile(str(path), pool=pool) as save_file:
+            save_file.decompress()
+    assert pool.stats()["hits"] == 1
+
+
+def test_buffer_in_use_is_not_reused(tmp_path):
+    first = tmp_path / "first.sav"
+    second = tmp_path / "second.sav"
+    write_save(first, n_groups=20)
+    write_save(second, n_groups=21)
+    pool = BufferPool()
+    with SaveFile(str(first), pool=pool) as save_file:
+        save_file.decompress()
+        tape = save_file.index()
+        data = bytes(tape.data)
+    # the tape still holds the first buffer, the second save gets its own
+    with SaveFile(str(second), pool=pool) as save_file:
+        save_file.decompress()
+        assert bytes(tape.data) == data
+    assert pool.stats()["hits"] == 0
+    assert pool.stats()["exported"] == 1
+
+
+def test_oversized_chunk_is_rejected_before_allocating(tmp_path):
+    # a 70 byte file claiming a 1 GiB chunk
+    path = tmp_path / "claim.sav"
+    header_size = 28
+    path.write_bytes(
+        b"SNFHFZLC"
+        + struct.pack("<ii", 1, header_size)
+        + struct.pack("<iii", 42, 2**30, 0)
+        + bytes(42)
+    )
+    pool = BufferPool()
+    save_file = SaveFile(str(path), pool=pool)
+    with pytest.raises(ValueError):
+        save_file.decompress()
+    assert pool.stats()["misses"] == 0
+    assert save_file.buffer is None
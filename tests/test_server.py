@@ -0,0 +1,105 @@
+import http.client
+import json
+import threading
+from pathlib import Path
+
+import pytest
+from savegen import write_save
+
+from src.savefile import SaveFile
+from src.server import (
+    INVALID_PARAMS,
+    INVALID_REQUEST,
+    SERVER_ERROR,
+    SaveCache,
+    SaveService,
+    make_server,
+)
+
+
+@pytest.fixture
+def save_path(tmp_path):
+    path = tmp_path / "synthetic.sav"
+    write_save(path, n_groups=30)
+    return str(path)
+
+
+@pytest.fixture
+def service():
+    return SaveService(SaveCache(max_saves=2))
+
+
+def call(service, method, **params):
+    return service.dispatch(
+        {"jsonrpc": "2.0", "id": 1, "method": method, "params": params}
+    )
+
+
+def test_list_is_paginated(service, save_path):
+    first = call(service, "list", path=save_path, limit=10)["result"]
+    assert len(first["records"]) == 10
+    second = call(service, "list", path=save_path, offset=10, limit=10)["result"]
+    assert first["records"][-1]["index"] < second["records"][0]["index"]
+
+    parent = next(r for r in first["records"] if r["magic"] == "BLCK")["index"]
+    children = call(service, "list", path=save_path, parent=parent)["result"]
+    assert [r["parent"] for r in children["records"]] == [parent] * 3
+    assert children["next_offset"] is None
+
+
+def test_find_uses_name_and_magic(service, save_path):
+    result = call(service, "find", path=save_path, name="X", magic="PORP", limit=1000)
+    records = result["result"]["records"]
+    assert len(records) == 30
+    assert {(r["name"], r["magic"]) for r in records} == {("X", "PORP")}
+
+
+def test_get_and_export(service, save_path):
+    result = call(service, "get", path=save_path, index=0)["result"]
+    assert result["value"] == 0
+
+    first = call(service, "export", path=save_path)["result"]
+    assert call(service, "export", path=save_path)["result"].data is first.data
+    with SaveFile(save_path) as save_file:
+        save_file.decompress()
+        assert json.loads(first.data) == json.loads(json.dumps(save_file.parse()))
+
+
+def test_errors_are_returned_as_responses(service, save_path, tmp_path):
+    assert call(service, "get", path=5)["error"]["code"] == INVALID_PARAMS
+    for index in (True, -1, "0"):
+        response = call(service, "get", path=save_path, index=index)
+        assert response["error"]["code"] == INVALID_PARAMS
+
+    corrupt = tmp_path / "corrupt.sav"
+    data = bytearray(Path(save_path).read_bytes())
+    data[40:60] = b"\xff" * 20
+    corrupt.write_bytes(data)
+    assert (
+        call(service, "get", path=str(corrupt), index=0)["error"]["code"]
+        == SERVER_ERROR
+    )
+
+
+def test_http_roundtrip(save_path):
+    server = make_server(port=0, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection(*server.server_address)
+        for method in ("export", "list"):
+            request = {"jsonrpc": "2.0", "id": 7, "method": method}
+            request["params"] = {"path": save_path}
+            connection.request("POST", "/", json.dumps(request))
+            response = json.loads(connection.getresponse().read())
+            assert response["id"] == 7 and "result" in response
+
+        connection.putrequest("POST", "/")
+        connection.putheader("Content-Length", "abc")
+        connection.endheaders()
+        response = json.loads(connection.getresponse().read())
+        assert response["error"]["code"] == INVALID_REQUEST
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
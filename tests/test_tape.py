@@ -0,0 +1,48 @@
+import struct
+
+import pytest
+from savegen import NAMES, build, idx
+
+from src.parser import VariableParser
+from src.savefile import SaveFile
+from src.tape import UNKNOWN_MAGIC, Tape
+from src.utils import Reader, Size
+
+
+def test_roots_decode_like_parse():
+    save_file = SaveFile("synthetic")
+    save_file.data = memoryview(build(5))
+    tape = save_file.index()
+    variable_groups = save_file.parse()
+    assert [tape.decode(i) for i in tape.roots()] == [
+        variable for group in variable_groups for variable in group
+    ]
+
+
+def test_unrecognized_magics_share_one_slot():
+    data = bytes(range(256)) * 4
+    tape = Tape(data, [])
+    for offset in range(0, 1024, 4):
+        tape.reader.seek(offset)
+        tape.index_record(tape.reader, Size(4), -1)
+    assert len(tape) == 256
+    assert {tape.magic(i) for i in range(len(tape))} == {UNKNOWN_MAGIC}
+
+
+def test_name_indexes_resolve_like_parse():
+    # a negative index wraps around the name table in VLVariableParser
+    data = b"VL" + struct.pack("<hhi", -1, idx("Int32"), 7)
+    tape = Tape(data, NAMES)
+    tape.index_record(tape.reader, Size(len(data)), -1)
+    parsed = VariableParser(NAMES).parse(Reader(data), Size(len(data)))
+    assert (tape.magic(0), tape.name(0), tape.type_name(0)) == parsed[:3]
+    assert tape.ends[0] == len(data)
+
+
+def test_bad_type_index_raises_like_parse():
+    data = b"VL" + struct.pack("<hhi", idx("a"), len(NAMES) + 1, 7)
+    with pytest.raises(IndexError):
+        VariableParser(NAMES).parse(Reader(data), Size(len(data)))
+    tape = Tape(data, NAMES)
+    with pytest.raises(IndexError):
+        tape.index_record(tape.reader, Size(len(data)), -1)